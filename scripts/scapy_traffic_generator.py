@@ -4,8 +4,14 @@ Scapy Traffic Generator for EC2 Sensors
 Generates various types of network traffic for sensor testing
 """
 
+import os
 import sys
 import time
+import ctypes
+import ctypes.util
+import socket
+import itertools
+import threading
 import argparse
 from datetime import datetime
 
@@ -15,6 +21,101 @@ except ImportError:
     print("Error: scapy is not installed. Install with: sudo python3 -m pip install scapy")
     sys.exit(1)
 
+def csum_update(csum, old, new):
+    """Incrementally update a one's complement checksum after a 16-bit field change (RFC 1624)"""
+    total = (~csum & 0xFFFF) + (~old & 0xFFFF) + new
+    total = (total & 0xFFFF) + (total >> 16)
+    total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+# Packets are sent in bursts of pps / BURSTS_PER_SECOND, one burst per scheduler tick
+BURSTS_PER_SECOND = 100
+MAX_BURST = 1024
+
+# Seconds between statistics lines printed by the reporter thread
+STATS_INTERVAL = 1.0
+
+class iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", msghdr), ("msg_len", ctypes.c_uint)]
+
+class sockaddr_in(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),
+        ("sin_addr", ctypes.c_uint8 * 4),
+        ("sin_zero", ctypes.c_uint8 * 8),
+    ]
+
+def load_sendmmsg():
+    """Return libc's sendmmsg(2), or None where it is unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+class BurstSender:
+    """Send a burst of raw IP packets with a single sendmmsg(2) call"""
+
+    def __init__(self, sock, dst_ip):
+        self.sock = sock
+        self.dst = (dst_ip, 0)
+        self.sendmmsg = load_sendmmsg()
+        if self.sendmmsg is None:
+            return
+
+        # Every message shares one destination address; only the iovecs change per burst
+        self.addr = sockaddr_in(sin_family=socket.AF_INET)
+        self.addr.sin_addr[:] = socket.inet_aton(dst_ip)
+        self.iovs = (iovec * MAX_BURST)()
+        self.msgs = (mmsghdr * MAX_BURST)()
+        for i in range(MAX_BURST):
+            hdr = self.msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self.addr)
+            hdr.msg_namelen = ctypes.sizeof(self.addr)
+            hdr.msg_iov = ctypes.pointer(self.iovs[i])
+            hdr.msg_iovlen = 1
+
+    def send(self, packets):
+        """Send a list of bytes packets (at most MAX_BURST)"""
+        if self.sendmmsg is None:
+            for data in packets:
+                self.sock.sendto(data, self.dst)
+            return
+
+        # c_char_p points at each bytes object's own buffer; keep them referenced until sent
+        bufs = [ctypes.c_char_p(data) for data in packets]
+        for iov, buf, data in zip(self.iovs, bufs, packets):
+            iov.iov_base = ctypes.cast(buf, ctypes.c_void_p).value
+            iov.iov_len = len(data)
+
+        done = 0
+        while done < len(packets):
+            sent = self.sendmmsg(self.sock.fileno(), ctypes.addressof(self.msgs[done]), len(packets) - done, 0)
+            if sent < 0:
+                err = ctypes.get_errno()
+                raise OSError(err, os.strerror(err))
+            done += sent
+
 class TrafficGenerator:
     def __init__(self, src_ip, dst_ip, interface="eth1", src_mac=None, dst_mac=None):
         self.src_ip = src_ip
@@ -35,122 +136,151 @@ class TrafficGenerator:
     def print_stats(self):
         """Print current statistics"""
         if self.start_time:
-            duration = time.time() - self.start_time
+            duration = time.monotonic() - self.start_time
             pps = self.packets_sent / duration if duration > 0 else 0
             mbps = (self.bytes_sent * 8) / (1024 * 1024 * duration) if duration > 0 else 0
             self.log(f"Stats: {self.packets_sent} packets, {self.bytes_sent} bytes, {pps:.2f} pps, {mbps:.2f} Mbps")
 
-    def generate_http_traffic(self, duration=10, pps=100):
-        """Generate HTTP GET request traffic"""
-        self.log(f"Generating HTTP traffic: {pps} pps for {duration}s")
-        self.start_time = time.time()
+    def _open_socket(self, layer2=False):
+        """Open a persistent Scapy socket on the configured interface"""
+        if layer2:
+            return conf.L2socket(iface=self.interface)
+        return conf.L3socket(iface=self.interface)
+
+    def _open_raw_socket(self):
+        """Open a raw IPv4 socket bound to the configured interface"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, self.interface.encode())
+        return sock
+
+    def _report_stats(self, stop):
+        """Print statistics every STATS_INTERVAL seconds until stop is set"""
+        while not stop.wait(STATS_INTERVAL):
+            self.print_stats()
+
+    def _prepare_send_thread(self):
+        """Pin the sender to one CPU and request realtime priority to reduce pacing jitter"""
+        try:
+            os.sched_setaffinity(0, {os.cpu_count() - 1})
+        except (AttributeError, PermissionError, OSError):
+            pass
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(50))
+        except (AttributeError, PermissionError, OSError):
+            pass
+
+    def _send_loop(self, packets, duration, pps, layer2=False, raw=False):
+        """Send packets (or raw IP bytes when raw=True) at a fixed rate over one reused socket"""
+        # Report from a separate thread so stdout writes stay off the send path. It is
+        # started before the sender is pinned so it doesn't inherit the realtime policy.
+        stop_reporting = threading.Event()
+        reporter = threading.Thread(target=self._report_stats, args=(stop_reporting,), daemon=True)
+        reporter.start()
+
+        self._prepare_send_thread()
+
+        # Monotonic clock so wall-clock adjustments can't stretch or skip the schedule
+        self.start_time = time.monotonic()
+        end_time = self.start_time + duration
 
-        # Create HTTP GET request packet
-        http_get = "GET / HTTP/1.1\r\nHost: example.com\r\n\r\n"
-        pkt = IP(src=self.src_ip, dst=self.dst_ip)/TCP(dport=80, flags="PA")/Raw(load=http_get)
+        if raw:
+            sock = self._open_raw_socket()
+            send_burst = BurstSender(sock, self.dst_ip).send
+        else:
+            sock = self._open_socket(layer2)
 
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
+            def send_burst(burst):
+                for pkt in burst:
+                    sock.send(pkt)
+
+        burst_size = min(max(1, pps // BURSTS_PER_SECOND), MAX_BURST)
 
         try:
-            while time.time() < end_time:
-                send(pkt, iface=self.interface, verbose=0)
-                self.packets_sent += 1
-                self.bytes_sent += len(pkt)
-                time.sleep(interval)
-
-                if self.packets_sent % 100 == 0:
-                    self.print_stats()
+            for tick in itertools.count():
+                now = time.monotonic()
+                if now >= end_time:
+                    break
+
+                # Pace bursts against the absolute schedule so sleep overshoot doesn't accumulate
+                next_send = self.start_time + tick * burst_size / pps
+                if next_send > now:
+                    time.sleep(next_send - now)
+
+                burst = list(itertools.islice(packets, burst_size))
+                if not burst:
+                    break
+                send_burst(burst)
+                self.packets_sent += len(burst)
+                self.bytes_sent += sum(map(len, burst))
         except KeyboardInterrupt:
             self.log("Interrupted by user")
+        finally:
+            stop_reporting.set()
+            reporter.join()
+            sock.close()
 
         self.print_stats()
 
+    def generate_http_traffic(self, duration=10, pps=100):
+        """Generate HTTP GET request traffic"""
+        self.log(f"Generating HTTP traffic: {pps} pps for {duration}s")
+
+        # Create HTTP GET request packet
+        http_get = "GET / HTTP/1.1\r\nHost: example.com\r\n\r\n"
+        raw = bytes(IP(src=self.src_ip, dst=self.dst_ip)/TCP(dport=80, flags="PA")/Raw(load=http_get))
+
+        self._send_loop(itertools.repeat(raw), duration, pps, raw=True)
+
     def generate_dns_traffic(self, duration=10, pps=50):
         """Generate DNS query traffic"""
         self.log(f"Generating DNS traffic: {pps} pps for {duration}s")
-        self.start_time = time.time()
 
         # Create DNS query packet
-        pkt = IP(src=self.src_ip, dst=self.dst_ip)/UDP(dport=53)/DNS(rd=1, qd=DNSQR(qname="example.com"))
+        raw = bytes(IP(src=self.src_ip, dst=self.dst_ip)/UDP(dport=53)/DNS(rd=1, qd=DNSQR(qname="example.com")))
 
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
-
-        try:
-            while time.time() < end_time:
-                send(pkt, iface=self.interface, verbose=0)
-                self.packets_sent += 1
-                self.bytes_sent += len(pkt)
-                time.sleep(interval)
-
-                if self.packets_sent % 50 == 0:
-                    self.print_stats()
-        except KeyboardInterrupt:
-            self.log("Interrupted by user")
-
-        self.print_stats()
+        self._send_loop(itertools.repeat(raw), duration, pps, raw=True)
 
     def generate_tcp_syn_flood(self, duration=10, pps=100):
         """Generate TCP SYN flood traffic"""
         self.log(f"Generating TCP SYN flood: {pps} pps for {duration}s")
-        self.start_time = time.time()
 
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
+        # Serialize one SYN and patch its destination port in place for each send
+        template = bytearray(bytes(IP(src=self.src_ip, dst=self.dst_ip)/TCP(dport=80, flags="S")))
+        ihl = (template[0] & 0x0F) * 4
+        dport_off = ihl + 2
+        csum_off = ihl + 16
 
-        try:
+        def packets():
             port = 80
-            while time.time() < end_time:
-                # Vary destination port
-                pkt = IP(src=self.src_ip, dst=self.dst_ip)/TCP(dport=port, flags="S")
-                send(pkt, iface=self.interface, verbose=0)
-                self.packets_sent += 1
-                self.bytes_sent += len(pkt)
+            csum = int.from_bytes(template[csum_off:csum_off + 2], "big")
+            while True:
+                yield bytes(template)
 
-                port = (port % 65535) + 1
-                time.sleep(interval)
-
-                if self.packets_sent % 100 == 0:
-                    self.print_stats()
-        except KeyboardInterrupt:
-            self.log("Interrupted by user")
+                # Vary destination port
+                next_port = (port % 65535) + 1
+                csum = csum_update(csum, port, next_port)
+                template[dport_off:dport_off + 2] = next_port.to_bytes(2, "big")
+                template[csum_off:csum_off + 2] = csum.to_bytes(2, "big")
+                port = next_port
 
-        self.print_stats()
+        self._send_loop(packets(), duration, pps, raw=True)
 
     def generate_icmp_traffic(self, duration=10, pps=10):
         """Generate ICMP ping traffic"""
         self.log(f"Generating ICMP traffic: {pps} pps for {duration}s")
-        self.start_time = time.time()
 
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
-
-        try:
-            seq = 0
-            while time.time() < end_time:
+        def packets():
+            for seq in itertools.count():
+                pkt = IP(src=self.src_ip, dst=self.dst_ip)/ICMP(seq=seq & 0xFFFF)
                 if self.use_layer2:
-                    pkt = Ether(src=self.src_mac, dst=self.dst_mac)/IP(src=self.src_ip, dst=self.dst_ip)/ICMP(seq=seq)
-                    sendp(pkt, iface=self.interface, verbose=0)
-                else:
-                    pkt = IP(src=self.src_ip, dst=self.dst_ip)/ICMP(seq=seq)
-                    send(pkt, iface=self.interface, verbose=0)
-                self.packets_sent += 1
-                self.bytes_sent += len(pkt)
-                seq += 1
-                time.sleep(interval)
-
-                if self.packets_sent % 10 == 0:
-                    self.print_stats()
-        except KeyboardInterrupt:
-            self.log("Interrupted by user")
+                    pkt = Ether(src=self.src_mac, dst=self.dst_mac)/pkt
+                yield pkt
 
-        self.print_stats()
+        self._send_loop(packets(), duration, pps, layer2=self.use_layer2)
 
     def generate_mixed_traffic(self, duration=60, pps=100):
         """Generate mixed traffic (HTTP, DNS, ICMP)"""
         self.log(f"Generating mixed traffic: {pps} pps for {duration}s")
-        self.start_time = time.time()
 
         # Create packet templates
         http_get = "GET / HTTP/1.1\r\nHost: example.com\r\n\r\n"
@@ -158,52 +288,19 @@ class TrafficGenerator:
         dns_pkt = IP(src=self.src_ip, dst=self.dst_ip)/UDP(dport=53)/DNS(rd=1, qd=DNSQR(qname="example.com"))
         icmp_pkt = IP(src=self.src_ip, dst=self.dst_ip)/ICMP()
 
-        packets = [http_pkt, dns_pkt, icmp_pkt]
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
+        packets = tuple(bytes(pkt) for pkt in (http_pkt, dns_pkt, icmp_pkt))
 
-        try:
-            i = 0
-            while time.time() < end_time:
-                pkt = packets[i % len(packets)]
-                send(pkt, iface=self.interface, verbose=0)
-                self.packets_sent += 1
-                self.bytes_sent += len(pkt)
-                i += 1
-                time.sleep(interval)
-
-                if self.packets_sent % 100 == 0:
-                    self.print_stats()
-        except KeyboardInterrupt:
-            self.log("Interrupted by user")
-
-        self.print_stats()
+        self._send_loop(itertools.cycle(packets), duration, pps, raw=True)
 
     def generate_udp_flood(self, duration=10, pps=100, size=1400):
         """Generate UDP flood with custom payload size"""
         self.log(f"Generating UDP flood: {pps} pps, {size} bytes payload for {duration}s")
-        self.start_time = time.time()
 
         # Create UDP packet with custom payload
         payload = "X" * size
-        pkt = IP(src=self.src_ip, dst=self.dst_ip)/UDP(dport=9999)/Raw(load=payload)
+        raw = bytes(IP(src=self.src_ip, dst=self.dst_ip)/UDP(dport=9999)/Raw(load=payload))
 
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
-
-        try:
-            while time.time() < end_time:
-                send(pkt, iface=self.interface, verbose=0)
-                self.packets_sent += 1
-                self.bytes_sent += len(pkt)
-                time.sleep(interval)
-
-                if self.packets_sent % 100 == 0:
-                    self.print_stats()
-        except KeyboardInterrupt:
-            self.log("Interrupted by user")
-
-        self.print_stats()
+        self._send_loop(itertools.repeat(raw), duration, pps, raw=True)
 
 def main():
     parser = argparse.ArgumentParser(
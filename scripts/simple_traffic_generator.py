@@ -4,27 +4,362 @@ Simple Socket-Based Traffic Generator for EC2 Sensors
 Uses standard Python sockets which work reliably with AWS networking
 """
 
+import os
 import socket
 import time
 import argparse
 import sys
-from datetime import datetime
+import errno
+import struct
+import ctypes
+import ctypes.util
+import selectors
+import collections
+import itertools
+import concurrent.futures
 import threading
 
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+# Upper bound on pre-opened TCP connections kept for reuse (and on connects kept in flight)
+TCP_POOL_SIZE = 64
+# Seconds a connect may stay unanswered (SYNs dropped by a firewall) before it is given up
+CONNECT_TIMEOUT = 0.5
+# Seconds an HTTP connection waits for a reply before the target is taken to be a sink that never replies
+HTTP_REPLY_TIMEOUT = 1.0
+
+# File descriptors kept free of TCP sockets for stdio, selectors and UDP sockets
+FD_RESERVE = 32
+
+# SO_LINGER {on, 0s}: close() sends RST and skips TIME_WAIT, freeing the ephemeral port
+LINGER_RESET = struct.pack("ii", 1, 0)
+
+# Maximum number of UDP datagrams handed to the kernel in one sendmmsg call
+UDP_BATCH_SIZE = 64
+
+# With UDP GSO each message carries up to this many datagrams, split by the kernel
+UDP_GSO_SEGMENTS = 16
+UDP_GSO_MAX_BYTES = 65000
+UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103)
+# Longest a UDP worker blocks waiting for a full send buffer to drain before rechecking stop_flag
+UDP_BLOCKED_WAIT = 0.1
+
+# Sleep until this close to a send deadline, then spin for the rest
+PACER_SPIN = 200e-6
+# Above this many sends per second the pacer only waits once per batch of sends
+PACER_MAX_WAKEUPS = 20000
+# At most this many seconds of failed sends are made up once sends succeed again
+PACER_MAX_LAG = 1.0
+
+class BufferPool:
+    """Shared filler buffer handed out as zero-copy memoryview slices"""
+
+    def __init__(self, size=64 * 1024, fill=b"X"):
+        self.fill = fill
+        # Immutable, so every view of it is read-only (memoryview.toreadonly needs Python 3.8)
+        self.buf = fill * size
+
+    def get(self, size):
+        """Return a read-only view of size filler bytes, growing the buffer if needed"""
+        if size > len(self.buf):
+            # Views handed out earlier keep the old buffer alive
+            self.buf = self.fill * size
+        return memoryview(self.buf)[:size]
+
+# Payloads for every generator are slices of this one buffer
+PAYLOAD_POOL = BufferPool()
+
+class ConnectPipeline:
+    """Keep up to in_flight non-blocking TCP connects pending and hand out the ones that
+    complete, so data is only sent on connections that were established. Each call starts
+    at most one new connect, so connects go out no faster than the caller paces its calls"""
+
+    def __init__(self, open_socket, in_flight, timeout=CONNECT_TIMEOUT):
+        self.open_socket = open_socket
+        self.in_flight = in_flight
+        self.timeout = timeout
+        self.selector = selectors.DefaultSelector()
+        # fd -> (sock, issued), oldest first, so unanswered connects can be timed out
+        self.pending = collections.OrderedDict()
+        self.ready = collections.deque()
+
+    def _start_connect(self):
+        """Start one new connect unless in_flight sockets are already pending or ready"""
+        in_use = len(self.pending) + len(self.ready)
+        if in_use >= self.in_flight:
+            return
+        try:
+            sock = self.open_socket()
+        except OSError as e:
+            if e.errno in (errno.EMFILE, errno.ENFILE):
+                # Out of file descriptors: keep no more connects in flight than are open now
+                self.in_flight = max(1, in_use)
+            # Try again on the next call
+            return
+        self.selector.register(sock, selectors.EVENT_WRITE)
+        self.pending[sock.fileno()] = (sock, time.monotonic())
+
+    def _expire(self):
+        """Give up on connects nobody answered within timeout (SYNs dropped by a firewall)"""
+        cutoff = time.monotonic() - self.timeout
+        pending = self.pending
+        while pending:
+            fd, (sock, issued) = next(iter(pending.items()))
+            if issued > cutoff:
+                break
+            del pending[fd]
+            self.selector.unregister(sock)
+            sock.close()
+
+    def next_connected(self):
+        """Return an established socket, or None if no connect has completed yet"""
+        self._expire()
+        self._start_connect()
+        if not self.ready:
+            for key, _ in self.selector.select(0):
+                sock = key.fileobj
+                self.selector.unregister(sock)
+                del self.pending[key.fd]
+                if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR):
+                    # Refused or unreachable - replaced by a later call
+                    sock.close()
+                else:
+                    self.ready.append(sock)
+        return self.ready.popleft() if self.ready else None
+
+    def close(self):
+        """Close every pending and established socket"""
+        for sock, _ in self.pending.values():
+            sock.close()
+        self.pending.clear()
+        self.selector.close()
+        while self.ready:
+            self.ready.popleft().close()
+
+def tcp_socket_budget():
+    """Number of TCP sockets the open-file limit leaves room for, up to TCP_POOL_SIZE"""
+    if resource is None:
+        return TCP_POOL_SIZE
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return TCP_POOL_SIZE
+    return max(1, min(TCP_POOL_SIZE, soft - FD_RESERVE))
+
+def wait_until(deadline, stop=None):
+    """Wait until time.perf_counter() reaches deadline: sleep coarsely, then spin.
+    Returns early if the optional stop event is set during the sleep"""
+    now = time.perf_counter
+    slack = deadline - now()
+    if slack > PACER_SPIN + 3e-4:
+        if stop is None:
+            time.sleep(slack - PACER_SPIN)
+        elif stop.wait(slack - PACER_SPIN):
+            return
+    while now() < deadline:
+        pass
+
+class Pacer:
+    """Hold a send loop to a fixed rate using absolute deadlines, so sleep overshoot
+    doesn't accumulate the way a fixed sleep(1/pps) after every send does"""
+
+    def __init__(self, pps, stop=None):
+        self.pps = pps
+        self.stop = stop
+        self.interval = 1.0 / pps
+        self.batch = max(1, pps // PACER_MAX_WAKEUPS)
+        self.start = time.perf_counter()
+        self.deadline = self.start
+        self.pending = 0
+
+    def wait(self, count=1):
+        """Account for count sends and wait for the next deadline once a batch is pending"""
+        self.deadline += count * self.interval
+        self.pending += count
+        if self.pending >= self.batch:
+            self.pending = 0
+            wait_until(self.deadline, self.stop)
+
+    def retry(self):
+        """Pause one interval after a send that went nowhere, keeping its slot owed so
+        the rate is made up once sends succeed again"""
+        now = time.perf_counter()
+        # Don't let a long outage turn into an unbounded burst afterwards
+        self.deadline = max(self.deadline, now - PACER_MAX_LAG)
+        wait_until(now + self.interval, self.stop)
+
+    def owed(self, sent):
+        """Number of sends the schedule expects by now beyond the sent already done"""
+        return int((time.perf_counter() - self.start) * self.pps) + 1 - sent
+
+class iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", msghdr), ("msg_len", ctypes.c_uint)]
+
+class sockaddr_in(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),
+        ("sin_addr", ctypes.c_uint8 * 4),
+        ("sin_zero", ctypes.c_uint8 * 8),
+    ]
+
+def make_sockaddr_in(host, port):
+    """Build the binary IPv4 socket address for host:port once, for reuse by every send"""
+    addr = sockaddr_in(sin_family=socket.AF_INET, sin_port=socket.htons(port))
+    # gethostbyname returns IP literals unchanged and resolves hostnames once
+    addr.sin_addr[:] = socket.inet_pton(socket.AF_INET, socket.gethostbyname(host))
+    return addr
+
+def load_sendmmsg():
+    """Return libc's sendmmsg(2), or None where it is unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+class UDPBatchSender:
+    """Send the same UDP payload several times with a single sendmmsg(2) call,
+    optionally letting the kernel split each message into gso_segments datagrams"""
+
+    def __init__(self, sock, target_ip, target_port, payload, gso_segments=1, sockaddr=None):
+        self.sock = sock
+        self.addr_tuple = (target_ip, target_port)
+        # One private copy per sender: the ctypes iovec needs an immutable bytes object
+        self.payload = bytes(payload)
+        self.segments = 1
+        self.sendmmsg = load_sendmmsg()
+
+        if self.sendmmsg is not None:
+            # Every message points at the same payload iovec and destination address
+            self.addr = sockaddr or make_sockaddr_in(target_ip, target_port)
+            self.iov = iovec()
+            self.msgs = (mmsghdr * UDP_BATCH_SIZE)()
+            # Raw call arguments resolved once so each batch is a single foreign call
+            self.fd = sock.fileno()
+            self.msgs_addr = ctypes.addressof(self.msgs)
+            for msg in self.msgs:
+                msg.msg_hdr.msg_name = ctypes.addressof(self.addr)
+                msg.msg_hdr.msg_namelen = ctypes.sizeof(self.addr)
+                msg.msg_hdr.msg_iov = ctypes.pointer(self.iov)
+                msg.msg_hdr.msg_iovlen = 1
+
+        # Empty datagrams have nothing to segment
+        gso_segments = min(gso_segments, UDP_GSO_MAX_BYTES // len(payload)) if payload else 1
+        if gso_segments > 1 and sys.platform.startswith("linux"):
+            try:
+                # Socket-wide segment size: any send longer than the payload is split by the kernel
+                sock.setsockopt(socket.IPPROTO_UDP, UDP_SEGMENT, len(payload))
+                self.segments = gso_segments
+            except OSError:
+                # Kernel older than 4.18 or UDP GSO unsupported
+                pass
+        self._set_data(self.payload * self.segments)
+
+    def _set_data(self, data):
+        """Point every message at data"""
+        self.data = data
+        if self.sendmmsg is not None:
+            self.buf = ctypes.c_char_p(data)
+            self.iov.iov_base = ctypes.cast(self.buf, ctypes.c_void_p).value
+            self.iov.iov_len = len(data)
+
+    def _disable_gso(self):
+        """Fall back to one datagram per message"""
+        self.sock.setsockopt(socket.IPPROTO_UDP, UDP_SEGMENT, 0)
+        self.segments = 1
+        self._set_data(self.payload)
+
+    def send(self, count):
+        """Send roughly count datagrams (at most one full batch) and return how many went out"""
+        messages = min(max(1, count // self.segments), UDP_BATCH_SIZE)
+        try:
+            return self._send_messages(messages) * self.segments
+        except OSError as e:
+            # The device or path MTU can reject GSO only at send time
+            if self.segments == 1 or e.errno not in (errno.EINVAL, errno.EIO, errno.EOPNOTSUPP):
+                raise
+            self._disable_gso()
+            return self._send_messages(min(count, UDP_BATCH_SIZE))
+
+    def _send_messages(self, messages):
+        """Send messages copies of the current data and return how many were accepted"""
+        if self.sendmmsg is None:
+            for sent in range(messages):
+                try:
+                    self.sock.sendto(self.data, self.addr_tuple)
+                except BlockingIOError:
+                    if not sent:
+                        raise
+                    return sent
+            return messages
+
+        sent = self.sendmmsg(self.fd, self.msgs_addr, messages, 0)
+        if sent < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        return sent
+
 class SimpleTrafficGenerator:
     def __init__(self, target_ip, target_port, protocol='tcp'):
         self.target_ip = target_ip
         self.target_port = target_port
+        self.target_addr = (target_ip, target_port)
         self.protocol = protocol.lower()
         self.packets_sent = 0
         self.bytes_sent = 0
         self.start_time = None
         self.stop_flag = threading.Event()
+        self._tcp_pool = collections.deque()
+        self._tcp_pool_size = 0
+        self._tcp_pool_sndbuf = 0
+        self._tcp_pool_reply_timeout = None
+        # Scratch space for discarding whatever the target sends back on pooled connections
+        self._drain_buf = bytearray(64 * 1024)
+        self._stats_lock = threading.Lock()
+        self._log_second = None
+        self._log_stamp = b""
+
+        # HTTP request header split around the Content-Length digits
+        self._http_prefix = f"POST / HTTP/1.1\r\nHost: {target_ip}\r\nContent-Length: ".encode()
+        self._http_suffix = b"\r\nConnection: keep-alive\r\n\r\n"
 
     def log(self, message):
         """Print timestamped log message"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] {message}", flush=True)
+        # The timestamp only has second resolution, so format it once per second
+        second = int(time.time())
+        if second != self._log_second:
+            self._log_stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second)).encode()
+            self._log_second = second
+
+        out = getattr(sys.stdout, "buffer", None)
+        if out is None:
+            print(f"[{self._log_stamp.decode()}] {message}", flush=True)
+            return
+        out.write(b"[" + self._log_stamp + b"] " + message.encode() + b"\n")
+        out.flush()
 
     def print_stats(self):
         """Print current statistics"""
@@ -37,87 +372,301 @@ class SimpleTrafficGenerator:
             else:
                 self.log(f"Stats: {self.packets_sent} packets, {self.bytes_sent} bytes")
 
-    def generate_tcp_traffic(self, duration=10, pps=100, payload_size=1024):
+    def _http_header(self, content_length):
+        """Return the HTTP request header for a body of content_length bytes"""
+        return b"".join((self._http_prefix, b"%d" % content_length, self._http_suffix))
+
+    def _tune_tcp_socket(self, sock, sndbuf):
+        """Send small writes immediately and make room for sndbuf bytes without blocking"""
+        # Nagle would hold each short payload back waiting for an ACK
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if sndbuf > sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        try:
+            # Linux only
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 0)
+        except AttributeError:
+            pass
+
+    def _open_tcp_socket(self, reset_on_close=False, sndbuf=0):
+        """Open a non-blocking TCP socket and start connecting it to the target"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        self._tune_tcp_socket(sock, sndbuf)
+        if reset_on_close:
+            # One-shot connections: reset on close and let the local address be reused at once
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, LINGER_RESET)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # connect_ex returns the errno instead of raising. Anything other than "in progress"
+        # means the connect already failed; the socket is still handed back and the failure
+        # surfaces as a refused send (or SO_ERROR) on it, so it is never counted
+        sock.connect_ex(self.target_addr)
+        return sock
+
+    def _init_tcp_pool(self, pps, sndbuf=0, reply_timeout=None):
+        """Pre-open a pool of TCP connections that are reused across sends. With reply_timeout,
+        a connection carries one request at a time and is reused once the reply arrives; one
+        that gets no reply within reply_timeout is treated as a sink and no longer waited on"""
+        self._tcp_pool_size = max(1, min(pps, tcp_socket_budget()))
+        self._tcp_pool_sndbuf = sndbuf
+        self._tcp_pool_reply_timeout = reply_timeout
+        self._tcp_pool = collections.deque(self._open_pooled() for _ in range(self._tcp_pool_size))
+
+    def _open_pooled(self):
+        """Return a pool entry (sock, connect_by, reply_by) for a new connection, which has
+        CONNECT_TIMEOUT to complete its connect"""
+        sock = self._open_tcp_socket(sndbuf=self._tcp_pool_sndbuf)
+        return sock, time.monotonic() + CONNECT_TIMEOUT, None
+
+    def _close_tcp_pool(self):
+        """Close every pooled TCP connection"""
+        while self._tcp_pool:
+            sock = self._tcp_pool.popleft()[0]
+            # Closing with replies still unread would reset the connection instead of closing it
+            self._drain(sock)
+            sock.close()
+
+    def _drain(self, sock):
+        """Discard any replies waiting on a pooled connection. Returns how many bytes were
+        read, or None if the connection is closed or failed"""
+        received = 0
+        try:
+            # Unread replies would otherwise fill the receive window and stall the connection
+            while True:
+                n = sock.recv_into(self._drain_buf)
+                if not n:
+                    # The peer closed its end and would discard anything sent now
+                    return None
+                received += n
+        except BlockingIOError:
+            # Nothing more to read and no FIN: open (or still connecting)
+            return received
+        except OSError:
+            # ECONNRESET/ECONNREFUSED - the connection failed
+            return None
+
+    def _send_pooled(self, *buffers):
+        """Send buffers back to back on the first pooled connection that takes all of them.
+        Returns the number of bytes sent, or None if no connection could take them right now.
+
+        Connections that the peer closed, that failed, or whose connect timed out leave the
+        pool, and each call opens at most one replacement, so reconnects never outpace the sends"""
+        pool = self._tcp_pool
+        size = sum(map(len, buffers))
+        now = time.monotonic()
+        reply_timeout = self._tcp_pool_reply_timeout
+        sent = None
+
+        for _ in range(len(pool)):
+            sock, connect_by, reply_by = pool.popleft()
+            received = self._drain(sock)
+            if received is None:
+                sock.close()
+                continue
+
+            if reply_by:
+                if received:
+                    # Reply in: reuse it on its next turn, by when a peer that closes after
+                    # each reply has had time to deliver its FIN
+                    pool.append((sock, None, None))
+                elif now >= reply_by:
+                    # No reply at all: the target only sinks traffic, stop waiting on it
+                    pool.append((sock, None, False))
+                else:
+                    pool.append((sock, connect_by, reply_by))
+                continue
+
+            try:
+                # Scatter-gather: the kernel reads every buffer in place, no joined copy
+                sent = sock.sendmsg(buffers)
+            except BlockingIOError:
+                # Send buffer full or still connecting - keep it unless the connect timed out
+                sent = None
+                if connect_by is None or now < connect_by:
+                    pool.append((sock, connect_by, reply_by))
+                    continue
+            except OSError:
+                # EPIPE/ECONNRESET - the connection is gone
+                sent = None
+            else:
+                if sent == size:
+                    if reply_timeout and reply_by is None:
+                        reply_by = now + reply_timeout
+                    pool.append((sock, None, reply_by))
+                    break
+                # A short write leaves a cut-off message on the stream, which would corrupt
+                # the framing of everything sent after it on this connection
+                sent = None
+            sock.close()
+
+        if len(pool) < self._tcp_pool_size:
+            pool.append(self._open_pooled())
+        return sent
+
+    def _add_counts(self, packets, nbytes):
+        """Fold a worker's local counters into the shared totals"""
+        with self._stats_lock:
+            before = self.packets_sent
+            self.packets_sent += packets
+            self.bytes_sent += nbytes
+            if self.packets_sent // 100 != before // 100:
+                self.print_stats()
+
+    def _run_workers(self, worker, pps, workers, *args):
+        """Split pps across worker threads, each running worker(share_pps, *args)"""
+        workers = max(1, min(workers or os.cpu_count() or 1, pps))
+        shares = [pps // workers + (1 if i < pps % workers else 0) for i in range(workers)]
+
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            futures = [executor.submit(worker, share, *args) for share in shares]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+            except KeyboardInterrupt:
+                self.log("Interrupted by user")
+                self.stop_flag.set()
+            except Exception:
+                # One worker failed: stop the others now instead of at the deadline, then report it
+                self.stop_flag.set()
+                raise
+
+    def _paced_send(self, send, pacer, end_time, *buffers):
+        """Call send(*buffers) once per pacer slot until end_time or stop_flag, folding what
+        went out into the totals. send returns the bytes sent, or None if nothing went out"""
+        # Bound once so the per-packet loop skips attribute lookups
+        wait = pacer.wait
+        retry = pacer.retry
+        is_stopped = self.stop_flag.is_set
+        now = time.monotonic
+        # Counted locally and folded into the totals every 100 sends
+        packets = nbytes = 0
+
+        try:
+            while now() < end_time and not is_stopped():
+                sent = send(*buffers)
+                if sent is None:
+                    # Nothing went out: retry the slot rather than give it up, so only data
+                    # the kernel actually accepted is counted and the rate still holds
+                    retry()
+                    continue
+
+                packets += 1
+                nbytes += sent
+                if packets == 100:
+                    self._add_counts(packets, nbytes)
+                    packets = nbytes = 0
+
+                wait()
+        finally:
+            self._add_counts(packets, nbytes)
+
+    def generate_tcp_traffic(self, duration=10, pps=100, payload_size=1024, workers=None):
         """Generate TCP traffic"""
         self.log(f"Generating TCP traffic to {self.target_ip}:{self.target_port}")
         self.log(f"Rate: {pps} pps, Payload: {payload_size} bytes, Duration: {duration}s")
         self.start_time = time.time()
 
-        payload = b"X" * payload_size
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
-
-        try:
-            while time.time() < end_time and not self.stop_flag.is_set():
-                try:
-                    # Create new socket for each connection with very short timeout
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(0.01)  # 10ms timeout instead of 1s
-                    sock.setblocking(False)
-
-                    # Attempt connection (will likely fail immediately if no listener)
-                    try:
-                        sock.connect((self.target_ip, self.target_port))
-                    except BlockingIOError:
-                        # Connection in progress - send data anyway
-                        pass
-
-                    # Try to send (will work if connection succeeds, fail silently otherwise)
-                    try:
-                        sock.sendall(payload)
-                    except:
-                        pass
-
-                    self.packets_sent += 1
-                    self.bytes_sent += len(payload)
-                    sock.close()
-
-                    if self.packets_sent % 100 == 0:
-                        self.print_stats()
-
-                    time.sleep(interval)
-                except Exception:
-                    # Any error - just count the packet attempt and continue
-                    self.packets_sent += 1
-                    self.bytes_sent += len(payload)
+        payload = PAYLOAD_POOL.get(payload_size)
+        # Connects in flight are shared out across workers in proportion to their rate,
+        # so the total stays within TCP_POOL_SIZE and the open-file limit
+        connects_per_pps = min(pps, tcp_socket_budget()) / pps
+        end_time = time.monotonic() + duration
+        self._run_workers(self._tcp_worker, pps, workers, end_time, payload, connects_per_pps)
+        self.print_stats()
 
-        except KeyboardInterrupt:
-            self.log("Interrupted by user")
-            self.stop_flag.set()
+    def _tcp_worker(self, pps, end_time, payload, connects_per_pps):
+        """Send pps short TCP connections per second until time.monotonic() reaches end_time"""
+        # Pacing sleeps wake as soon as stop_flag is set
+        pacer = Pacer(pps, self.stop_flag)
+
+        # Each packet is one short connection: connects run ahead in the background and
+        # the payload goes out only once a connect completes, then the socket is reset
+        sndbuf = len(payload) * 8
+        pipeline = ConnectPipeline(lambda: self._open_tcp_socket(reset_on_close=True, sndbuf=sndbuf),
+                                   max(1, int(pps * connects_per_pps)))
+
+        next_connected = pipeline.next_connected
+
+        def send_one(data):
+            sock = next_connected()
+            if sock is None:
+                # No connect has completed yet
+                return None
+            try:
+                return sock.send(data)
+            except OSError:
+                return None
+            finally:
+                sock.close()
 
-        self.print_stats()
+        try:
+            self._paced_send(send_one, pacer, end_time, payload)
+        finally:
+            pipeline.close()
 
-    def generate_udp_traffic(self, duration=10, pps=100, payload_size=1024):
+    def generate_udp_traffic(self, duration=10, pps=100, payload_size=1024, workers=None):
         """Generate UDP traffic"""
         self.log(f"Generating UDP traffic to {self.target_ip}:{self.target_port}")
         self.log(f"Rate: {pps} pps, Payload: {payload_size} bytes, Duration: {duration}s")
         self.start_time = time.time()
 
+        payload = PAYLOAD_POOL.get(payload_size)
+        # One binary destination address shared by every worker's sendmmsg batches
+        sockaddr = make_sockaddr_in(self.target_ip, self.target_port)
+        end_time = time.monotonic() + duration
+        self._run_workers(self._udp_worker, pps, workers, end_time, payload, sockaddr)
+        self.print_stats()
+
+    def _udp_worker(self, pps, end_time, payload, sockaddr):
+        """Send pps UDP datagrams per second on this worker's own socket until end_time"""
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        payload = b"X" * payload_size
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Non-blocking, so a full send buffer is waited out with the selector (epoll on Linux)
+        sock.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_WRITE)
+        pacer = Pacer(pps)
+        # Only use GSO when a full segment burst is due at least every 10ms
+        gso_segments = min(UDP_GSO_SEGMENTS, pps // 100)
+        sender = UDPBatchSender(sock, self.target_ip, self.target_port, payload, gso_segments,
+                                sockaddr=sockaddr)
+
+        send = sender.send
+        wait_writable = selector.select
+        owed_now = pacer.owed
+        start, interval = pacer.start, pacer.interval
+        plen = len(payload)
+        is_stopped = self.stop_flag.is_set
+        now = time.monotonic
+        total = pending = 0
 
         try:
-            while time.time() < end_time and not self.stop_flag.is_set():
+            while now() < end_time and not is_stopped():
                 try:
-                    sock.sendto(payload, (self.target_ip, self.target_port))
-                    self.packets_sent += 1
-                    self.bytes_sent += len(payload)
+                    # Send every packet the rate schedule owes so far in one batch
+                    owed = owed_now(total)
+                    if owed <= 0:
+                        wait_until(start + total * interval, self.stop_flag)
+                        continue
 
-                    if self.packets_sent % 100 == 0:
-                        self.print_stats()
-
-                    time.sleep(interval)
+                    try:
+                        sent = send(owed)
+                    except BlockingIOError:
+                        # Send buffer full: sleep until the kernel drains it instead of retrying
+                        wait_writable(min(UDP_BLOCKED_WAIT, end_time - now()))
+                        continue
+                    total += sent
+                    pending += sent
+                    if pending >= 100:
+                        self._add_counts(pending, pending * plen)
+                        pending = 0
                 except OSError as e:
                     self.log(f"Error sending UDP packet: {e}")
-
-        except KeyboardInterrupt:
-            self.log("Interrupted by user")
-            self.stop_flag.set()
-
-        sock.close()
-        self.print_stats()
+        finally:
+            self._add_counts(pending, pending * plen)
+            selector.close()
+            sock.close()
 
     def generate_http_traffic(self, duration=10, pps=100, payload_size=1024):
         """Generate HTTP POST requests with configurable payload"""
@@ -126,57 +675,22 @@ class SimpleTrafficGenerator:
         self.start_time = time.time()
 
         # Use POST with body for larger payloads (like UDP/TCP)
-        payload = b"X" * payload_size
-        http_request = (
-            f"POST / HTTP/1.1\r\n"
-            f"Host: {self.target_ip}\r\n"
-            f"Content-Length: {payload_size}\r\n"
-            f"Connection: close\r\n"
-            f"\r\n"
-        ).encode() + payload
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
+        payload = PAYLOAD_POOL.get(payload_size)
+        # Header and body go out in one sendmsg without being concatenated
+        header = self._http_header(payload_size)
+        pacer = Pacer(pps)
+        end_time = time.monotonic() + duration
+        self._init_tcp_pool(pps, sndbuf=(len(header) + payload_size) * 8,
+                            reply_timeout=HTTP_REPLY_TIMEOUT)
 
         try:
-            while time.time() < end_time and not self.stop_flag.is_set():
-                try:
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.setblocking(False)
-
-                    # Try non-blocking connect
-                    try:
-                        sock.connect((self.target_ip, self.target_port))
-                    except BlockingIOError:
-                        # Connection in progress
-                        pass
-                    except:
-                        pass
-
-                    # Try to send HTTP request
-                    try:
-                        sock.sendall(http_request)
-                    except:
-                        pass
-
-                    # Count packet regardless of success
-                    self.packets_sent += 1
-                    self.bytes_sent += len(http_request)
-
-                    sock.close()
-
-                    if self.packets_sent % 100 == 0:
-                        self.print_stats()
-
-                    time.sleep(interval)
-                except Exception:
-                    # Count packet anyway
-                    self.packets_sent += 1
-                    self.bytes_sent += len(http_request)
-
+            # Each request goes out on a pooled keep-alive connection
+            self._paced_send(self._send_pooled, pacer, end_time, header, payload)
         except KeyboardInterrupt:
             self.log("Interrupted by user")
             self.stop_flag.set()
 
+        self._close_tcp_pool()
         self.print_stats()
 
     def generate_mixed_traffic(self, duration=60, pps=50, payload_size=1024):
@@ -186,54 +700,41 @@ class SimpleTrafficGenerator:
         self.start_time = time.time()
 
         udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        payload = b"X" * payload_size
-        interval = 1.0 / pps
-        end_time = self.start_time + duration
+        payload = PAYLOAD_POOL.get(payload_size)
+        pacer = Pacer(pps)
+        end_time = time.monotonic() + duration
+        self._init_tcp_pool(pps, sndbuf=len(payload) * 8)
+
+        sendto = udp_sock.sendto
+        addr = self.target_addr
+
+        def send_udp(data):
+            try:
+                return sendto(data, addr)
+            except OSError:
+                return None
+
+        # Alternate UDP and TCP (on a pooled connection) without a per-packet branch
+        next_sender = itertools.cycle((send_udp, self._send_pooled)).__next__
+        sender = next_sender()
+
+        def send_mixed(data):
+            nonlocal sender
+            sent = sender(data)
+            if sent is not None:
+                # Move to the other protocol only once this one's packet is out, so a retried
+                # slot stays with the protocol that owes it and the mix stays 1:1
+                sender = next_sender()
+            return sent
 
         try:
-            i = 0
-            while time.time() < end_time and not self.stop_flag.is_set():
-                try:
-                    if i % 2 == 0:
-                        # Send UDP
-                        udp_sock.sendto(payload, (self.target_ip, self.target_port))
-                    else:
-                        # Send TCP with non-blocking socket
-                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        sock.setblocking(False)
-                        try:
-                            sock.connect((self.target_ip, self.target_port))
-                        except BlockingIOError:
-                            # Connection in progress, continue
-                            pass
-                        except:
-                            pass
-
-                        # Try to send, fail silently if connection isn't established
-                        try:
-                            sock.sendall(payload)
-                        except:
-                            pass
-                        sock.close()
-
-                    self.packets_sent += 1
-                    self.bytes_sent += len(payload)
-                    i += 1
-
-                    if self.packets_sent % 100 == 0:
-                        self.print_stats()
-
-                    time.sleep(interval)
-                except Exception:
-                    # Count packet anyway
-                    self.packets_sent += 1
-                    self.bytes_sent += len(payload)
-
+            self._paced_send(send_mixed, pacer, end_time, payload)
         except KeyboardInterrupt:
             self.log("Interrupted by user")
             self.stop_flag.set()
 
         udp_sock.close()
+        self._close_tcp_pool()
         self.print_stats()
 
 def main():
@@ -270,6 +771,8 @@ Traffic Types:
     parser.add_argument('-r', '--rate', type=int, default=100, help='Packets per second (default: 100)')
     parser.add_argument('-D', '--duration', type=int, default=10, help='Duration in seconds (default: 10)')
     parser.add_argument('--size', type=int, default=1024, help='Payload size in bytes (default: 1024)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                       help='Sender threads for tcp/udp, sharing the rate (default: CPU count)')
 
     args = parser.parse_args()
 
@@ -278,9 +781,11 @@ Traffic Types:
 
     # Generate traffic based on protocol
     if args.protocol == 'tcp':
-        gen.generate_tcp_traffic(duration=args.duration, pps=args.rate, payload_size=args.size)
+        gen.generate_tcp_traffic(duration=args.duration, pps=args.rate, payload_size=args.size,
+                                 workers=args.workers)
     elif args.protocol == 'udp':
-        gen.generate_udp_traffic(duration=args.duration, pps=args.rate, payload_size=args.size)
+        gen.generate_udp_traffic(duration=args.duration, pps=args.rate, payload_size=args.size,
+                                 workers=args.workers)
     elif args.protocol == 'http':
         gen.generate_http_traffic(duration=args.duration, pps=args.rate, payload_size=args.size)
     elif args.protocol == 'mixed':